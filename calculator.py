@@ -1,20 +1,11 @@
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 from datetime import datetime
 
-# Настройки страницы
-st.set_page_config(
-    page_title="💰 Продвинутый калькулятор сложных процентов",
-    page_icon="📈",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
 # Адаптивные стили для светлой/темной темы
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     /* Общие стили */
     .main {
@@ -71,7 +62,50 @@ st.markdown("""
         color: white !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+RESULT_COLUMNS = [
+    'Year', 'Start Balance', 'Contributions', 'Interest Earned',
+    'Taxes Paid', 'End Balance (Nominal)', 'End Balance (Real)', 'Inflation Factor'
+]
+
+# Годовые показатели в виде массивов NumPy (без pandas и словарей)
+def _compute_kernel(principal, yearly_contributions, rate, years, freq, infl, tax):
+    periods = years * freq
+    period_rate = rate / freq
+    period_contribution = yearly_contributions / freq
+    
+    # Каждый период: пополнение, затем проценты за вычетом налога,
+    # т.е. B[k] = (B[k-1] + c) * g. Считаем все периоды сразу по формуле
+    # геометрической прогрессии вместо вложенного цикла.
+    g = 1 + period_rate * (1 - tax)
+    periods_arr = np.arange(1, periods + 1)
+    gp = np.power(g, periods_arr, dtype=np.float64)
+    if g == 1:
+        bal_period = principal + period_contribution * periods_arr
+    else:
+        bal_period = principal * gp + period_contribution * g * (gp - 1) / (g - 1)
+    
+    # Проценты периода начисляются на баланс после пополнения.
+    # Периоды раскладываем в матрицу (годы x freq): строка - один год,
+    # годовые суммы берутся по строке без накопления общей суммы.
+    bal_before = np.concatenate(([principal], bal_period[:-1])) + period_contribution
+    interest_year = (bal_before * period_rate).reshape(years, freq).sum(axis=1)
+    
+    years_idx = np.arange(1, years + 1, dtype=np.int32)
+    end_nominal = bal_period.reshape(years, freq)[:, -1]
+    inflation_factors = np.power(1.0 + infl, years_idx, dtype=np.float64)
+    
+    return (
+        years_idx,
+        np.concatenate(([principal], end_nominal[:-1])),
+        np.full(years, yearly_contributions),
+        interest_year,
+        interest_year * tax,
+        end_nominal,
+        end_nominal / inflation_factors,
+        inflation_factors
+    )
 
 class CompoundInterestCalculator:
     def __init__(self, params):
@@ -87,60 +121,123 @@ class CompoundInterestCalculator:
         self.currency = params['currency']
         
     def calculate(self):
-        periods = self.years * self.compounding_freq
-        period_rate = self.interest_rate / self.compounding_freq
-        balance_nominal = self.principal
-        balance_real = self.principal
-        results = []
-        total_contributions = self.principal
-        total_interest = 0
-        total_taxes = 0
+        yearly_contributions = self.yearly_contribution + self.monthly_contribution * 12
+        columns = _compute_kernel(
+            self.principal,
+            yearly_contributions,
+            self.interest_rate,
+            self.years,
+            self.compounding_freq,
+            self.inflation_rate,
+            self.tax_rate
+        )
+        _, _, _, interest_earned, taxes_paid, end_nominal, end_real, _ = columns
         
-        for year in range(1, self.years + 1):
-            yearly_contributions = self.yearly_contribution + self.monthly_contribution * 12
-            year_start_balance = balance_nominal
-            
-            for period in range(self.compounding_freq):
-                period_contribution = yearly_contributions / self.compounding_freq
-                balance_nominal += period_contribution
-                total_contributions += period_contribution
-                
-                interest = balance_nominal * period_rate
-                tax = interest * self.tax_rate
-                balance_nominal += interest - tax
-                total_interest += interest
-                total_taxes += tax
-            
-            inflation_factor = (1 + self.inflation_rate) ** year
-            balance_real = balance_nominal / inflation_factor
-            
-            results.append({
-                'Year': year,
-                'Start Balance': year_start_balance,
-                'Contributions': yearly_contributions,
-                'Interest Earned': total_interest - sum(r.get('Interest Earned', 0) for r in results),
-                'Taxes Paid': total_taxes - sum(r.get('Taxes Paid', 0) for r in results),
-                'End Balance (Nominal)': balance_nominal,
-                'End Balance (Real)': balance_real,
-                'Inflation Factor': inflation_factor
-            })
+        balance_nominal = float(end_nominal[-1])
+        balance_real = float(end_real[-1])
+        total_contributions = self.principal + yearly_contributions * self.years
+        total_interest = float(interest_earned.sum())
+        total_taxes = float(taxes_paid.sum())
+        
+        df = pd.DataFrame(dict(zip(RESULT_COLUMNS, columns)), copy=False)
         
-        df = pd.DataFrame(results)
         summary = {
             'Final Amount (Nominal)': balance_nominal,
             'Final Amount (Real)': balance_real,
             'Total Contributions': total_contributions,
             'Total Interest': total_interest,
             'Total Taxes': total_taxes,
+            'Net Contributions': total_contributions - self.principal,
+            'Net Interest': total_interest - total_taxes,
             'CAGR': (balance_nominal / self.principal) ** (1 / self.years) - 1
         }
         
         return df, summary
 
+@st.cache_data(max_entries=128)
+def run_calculation(params_key):
+    # Streamlit перезапускает скрипт при каждом изменении виджета;
+    # при тех же параметрах результат берется из кэша
+    calculator = CompoundInterestCalculator(dict(params_key))
+    return calculator.calculate()
+
+@st.cache_data(max_entries=128)
+def export_csv(params_key, _results_df):
+    # Таблица однозначно определяется параметрами, поэтому ключом кэша
+    # служат они, а сам DataFrame (с префиксом "_") не хэшируется
+    return _results_df.to_csv(index=False).encode('utf-8')
+
 def format_currency(value, currency):
     return f"{value:,.0f} {currency}"
 
+@st.cache_data(max_entries=128)
+def build_growth_chart(years, nominal, real, currency, template):
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=years, 
+        y=nominal,
+        name='Номинальная стоимость',
+        line=dict(color='#4e79a7', width=3),
+        hovertemplate="Год %{x}<br>%{y:,.0f} " + currency
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=years, 
+        y=real,
+        name='Реальная стоимость (с инфляцией)',
+        line=dict(color='#e15759', width=3),
+        hovertemplate="Год %{x}<br>%{y:,.0f} " + currency
+    ))
+    
+    fig.update_layout(
+        title='Динамика роста инвестиций',
+        xaxis_title='Годы',
+        yaxis_title=f"Сумма, {currency}",
+        hovermode='x unified',
+        template=template,
+        height=500,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=128)
+def build_composition_chart(principal, contributions, net_interest, currency):
+    labels = ['Начальные инвестиции', 'Пополнения', 'Проценты (после налогов)']
+    values = [principal, contributions, net_interest]
+    
+    fig = go.Figure(go.Pie(
+        labels=labels,
+        values=values,
+        hole=.4,
+        marker_colors=['#4e79a7','#59a14f','#f28e2b'],
+        textinfo='percent+value',
+        texttemplate="%{label}<br>%{value:,.0f} " + currency + " (%{percent})",
+        hoverinfo='label+percent+value'
+    ))
+    
+    fig.update_layout(
+        title='Состав итоговой суммы',
+        height=500,
+        showlegend=False
+    )
+    
+    return fig
+
 def main():
+    # Настройки страницы: должны быть первым вызовом Streamlit в прогоне
+    st.set_page_config(
+        page_title="💰 Продвинутый калькулятор сложных процентов",
+        page_icon="📈",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    # Стили нужно выводить при каждом перезапуске: элементы, не отрисованные
+    # в очередном прогоне скрипта, Streamlit удаляет со страницы
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+    
     st.title("💰 Калькулятор сложных процентов")
     st.markdown("""
     <div style="background-color: var(--card-bg); padding: 15px; border-radius: 10px; margin-bottom: 20px; border: 1px solid var(--border-color);">
@@ -150,83 +247,86 @@ def main():
     """, unsafe_allow_html=True)
     
     with st.expander("⚙️ Параметры инвестирования", expanded=True):
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            initial_investment = st.number_input(
-                "Начальные инвестиции", 
-                min_value=0, 
-                value=100000,
-                step=1000
-            )
-            
-            monthly_contribution = st.number_input(
-                "Ежемесячное пополнение", 
-                min_value=0, 
-                value=10000,
-                step=1000
-            )
-            
-            interest_rate = st.number_input(
-                "Годовая процентная ставка (%)", 
-                min_value=0.0, 
-                max_value=100.0, 
-                value=10.0,
-                step=0.1,
-                format="%.1f"
-            )
+        with st.form("params_form"):
+            col1, col2, col3 = st.columns(3)
             
-        with col2:
-            investment_period = st.number_input(
-                "Срок инвестирования (лет)", 
-                min_value=1, 
-                max_value=100, 
-                value=10,
-                step=1
-            )
-            
-            yearly_contribution = st.number_input(
-                "Годовое пополнение", 
-                min_value=0, 
-                value=0,
-                step=1000
-            )
-            
-            inflation_rate = st.number_input(
-                "Ожидаемая инфляция (%)", 
-                min_value=0.0, 
-                max_value=100.0, 
-                value=5.0,
-                step=0.1,
-                format="%.1f"
-            )
-            
-        with col3:
-            compounding_freq = st.selectbox(
-                "Частота начисления процентов",
-                options=[12, 4, 1],
-                format_func=lambda x: {
-                    12: "Ежемесячно", 
-                    4: "Ежеквартально", 
-                    1: "Ежегодно"
-                }[x],
-                index=0
-            )
-            
-            tax_rate = st.number_input(
-                "Налоговая ставка на доход (%)", 
-                min_value=0.0, 
-                max_value=100.0, 
-                value=13.0,
-                step=0.1,
-                format="%.1f"
-            )
+            with col1:
+                initial_investment = st.number_input(
+                    "Начальные инвестиции", 
+                    min_value=0, 
+                    value=100000,
+                    step=1000
+                )
+                
+                monthly_contribution = st.number_input(
+                    "Ежемесячное пополнение", 
+                    min_value=0, 
+                    value=10000,
+                    step=1000
+                )
+                
+                interest_rate = st.number_input(
+                    "Годовая процентная ставка (%)", 
+                    min_value=0.0, 
+                    max_value=100.0, 
+                    value=10.0,
+                    step=0.1,
+                    format="%.1f"
+                )
+                
+            with col2:
+                investment_period = st.number_input(
+                    "Срок инвестирования (лет)", 
+                    min_value=1, 
+                    max_value=100, 
+                    value=10,
+                    step=1
+                )
+                
+                yearly_contribution = st.number_input(
+                    "Годовое пополнение", 
+                    min_value=0, 
+                    value=0,
+                    step=1000
+                )
+                
+                inflation_rate = st.number_input(
+                    "Ожидаемая инфляция (%)", 
+                    min_value=0.0, 
+                    max_value=100.0, 
+                    value=5.0,
+                    step=0.1,
+                    format="%.1f"
+                )
+                
+            with col3:
+                compounding_freq = st.selectbox(
+                    "Частота начисления процентов",
+                    options=[12, 4, 1],
+                    format_func=lambda x: {
+                        12: "Ежемесячно", 
+                        4: "Ежеквартально", 
+                        1: "Ежегодно"
+                    }[x],
+                    index=0
+                )
+                
+                tax_rate = st.number_input(
+                    "Налоговая ставка на доход (%)", 
+                    min_value=0.0, 
+                    max_value=100.0, 
+                    value=13.0,
+                    step=0.1,
+                    format="%.1f"
+                )
+                
+                currency = st.selectbox(
+                    "Валюта",
+                    options=["₽ Рубли", "$ Доллары", "€ Евро", "£ Фунты"],
+                    index=0
+                )
             
-            currency = st.selectbox(
-                "Валюта",
-                options=["₽ Рубли", "$ Доллары", "€ Евро", "£ Фунты"],
-                index=0
-            )
+            submitted = st.form_submit_button("Рассчитать", type="primary", use_container_width=True)
     
     params = {
         'initial_investment': initial_investment,
@@ -239,10 +339,11 @@ def main():
         'tax_rate': tax_rate,
         'currency': currency.split()[0]
     }
+    cur = params['currency']
     
-    if st.button("Рассчитать", type="primary", use_container_width=True):
-        calculator = CompoundInterestCalculator(params)
-        results_df, summary = calculator.calculate()
+    if submitted:
+        params_key = tuple(sorted(params.items()))
+        results_df, summary = run_calculation(params_key)
         
         # Отображение результатов
         st.markdown("---")
@@ -252,13 +353,13 @@ def main():
         with col1:
             st.metric(
                 "Итоговая сумма (номинал)", 
-                format_currency(summary['Final Amount (Nominal)'], params['currency'])
+                format_currency(summary['Final Amount (Nominal)'], cur)
             )
             
         with col2:
             st.metric(
                 "Итоговая сумма (реальная)", 
-                format_currency(summary['Final Amount (Real)'], params['currency']),
+                format_currency(summary['Final Amount (Real)'], cur),
                 delta=f"{inflation_rate:.1f}% инфляция ежегодно"
             )
             
@@ -272,82 +373,44 @@ def main():
         tab1, tab2, tab3 = st.tabs(["📈 График роста", "🧩 Состав суммы", "📋 Подробная таблица"])
         
         with tab1:
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=results_df['Year'], 
-                y=results_df['End Balance (Nominal)'],
-                name='Номинальная стоимость',
-                line=dict(color='#4e79a7', width=3),
-                hovertemplate="Год %{x}<br>%{y:,.0f} " + params['currency']
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=results_df['Year'], 
-                y=results_df['End Balance (Real)'],
-                name='Реальная стоимость (с инфляцией)',
-                line=dict(color='#e15759', width=3),
-                hovertemplate="Год %{x}<br>%{y:,.0f} " + params['currency']
-            ))
-            
-            fig.update_layout(
-                title='Динамика роста инвестиций',
-                xaxis_title='Годы',
-                yaxis_title=f"Сумма, {params['currency']}",
-                hovermode='x unified',
-                template='plotly_white' if st._config.get_option("theme.base") == "light" else 'plotly_dark',
-                height=500,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+            fig = build_growth_chart(
+                tuple(results_df['Year']),
+                tuple(results_df['End Balance (Nominal)']),
+                tuple(results_df['End Balance (Real)']),
+                cur,
+                'plotly_white' if st._config.get_option("theme.base") == "light" else 'plotly_dark'
             )
-            
             st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            labels = ['Начальные инвестиции', 'Пополнения', 'Проценты (после налогов)']
-            values = [
+            fig = build_composition_chart(
                 params['initial_investment'],
-                summary['Total Contributions'] - params['initial_investment'],
-                summary['Total Interest'] - summary['Total Taxes']
-            ]
-            
-            fig = go.Figure(go.Pie(
-                labels=labels,
-                values=values,
-                hole=.4,
-                marker_colors=['#4e79a7','#59a14f','#f28e2b'],
-                textinfo='percent+value',
-                texttemplate="%{label}<br>%{value:,.0f} " + params['currency'] + " (%{percent})",
-                hoverinfo='label+percent+value'
-            ))
-            
-            fig.update_layout(
-                title='Состав итоговой суммы',
-                height=500,
-                showlegend=False
+                summary['Net Contributions'],
+                summary['Net Interest'],
+                cur
             )
-            
             st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
-            display_df = results_df.copy()
-            display_df.columns = [
+            display_columns = [
                 'Год', 'Начало года', 'Пополнения', 'Начисленные проценты', 
                 'Уплачено налогов', 'Конец года (ном.)', 'Конец года (реал.)', 'Фактор инфляции'
             ]
+            display_df = results_df.rename(columns=dict(zip(RESULT_COLUMNS, display_columns)))
             
-            # Форматирование чисел
-            for col in display_df.columns[1:-1]:
-                display_df[col] = display_df[col].apply(lambda x: f"{x:,.0f} {params['currency']}")
-            display_df['Фактор инфляции'] = display_df['Фактор инфляции'].apply(lambda x: f"{x:.2f}")
+            # Форматирование чисел (Styler форматирует при отрисовке)
+            money_format = '{:,.0f} ' + cur
+            formats = {col: money_format for col in display_columns[1:-1]}
+            formats['Фактор инфляции'] = '{:.2f}'
             
             st.dataframe(
-                display_df,
+                display_df.style.format(formats),
                 height=500,
                 use_container_width=True
             )
             
             # Кнопка экспорта
-            csv = results_df.to_csv(index=False).encode('utf-8')
+            csv = export_csv(params_key, results_df)
             st.download_button(
                 label="📥 Экспорт в CSV",
                 data=csv,
@@ -368,22 +431,22 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 st.metric("Общие пополнения", format_currency(
-                    summary['Total Contributions'] - params['initial_investment'], 
-                    params['currency']
+                    summary['Net Contributions'], 
+                    cur
                 ))
                 st.metric("Общие налоги", format_currency(
                     summary['Total Taxes'], 
-                    params['currency']
+                    cur
                 ))
                 
             with col2:
                 st.metric("Общий процентный доход", format_currency(
                     summary['Total Interest'], 
-                    params['currency']
+                    cur
                 ))
                 st.metric("Чистый доход (после налогов)", format_currency(
-                    summary['Total Interest'] - summary['Total Taxes'], 
-                    params['currency']
+                    summary['Net Interest'], 
+                    cur
                 ))
     else:
         st.info("Введите параметры инвестирования и нажмите кнопку 'Рассчитать'")